@@ -35,6 +35,7 @@ You can manually edit your config file or use a command like
 (e.g. `roboduck.update_config(model_name=None)`) will delete that field from
 your config file.
 """
+from functools import lru_cache
 import os
 from pathlib import Path
 import warnings
@@ -47,6 +48,13 @@ CONFIG_PATH = Path('~/.roboduck/config.yaml').expanduser()
 # User can optionally set this to a custom path. This should still end
 # with ".yaml" or ".yml".
 CONFIG_PATH_ENV_VAR = "ROBODUCK_CONFIG_PATH"
+# apply_config_defaults adds this key to chat kwargs after resolving a
+# template's defaults so that a second call (e.g. in Chat.__init__ after
+# Chat.from_template) knows the config has already been consulted.
+DEFAULTS_APPLIED_KEY = '_roboduck_defaults_applied'
+# Most recent key that set_openai_api_key validated and exported. Lets
+# repeated calls (e.g. from multiple entrypoints) skip redundant work.
+_last_api_key_set = ''
 
 
 def get_config_path() -> Path:
@@ -59,7 +67,17 @@ def get_config_path() -> Path:
         The path to the roboduck config file (yaml), either the default path
         or the path specified by the user-set environment variable.
     """
-    return Path(os.environ.get(CONFIG_PATH_ENV_VAR, CONFIG_PATH))
+    return _expanded_path(os.environ.get(CONFIG_PATH_ENV_VAR)
+                          or str(CONFIG_PATH))
+
+
+@lru_cache(maxsize=8)
+def _expanded_path(path: str) -> Path:
+    """Path(path).expanduser(), cached by the raw string since
+    get_config_path is called every time we read the config and the env var
+    almost never changes within a session.
+    """
+    return Path(path).expanduser()
 
 
 def update_config(**kwargs) -> None:
@@ -103,17 +121,21 @@ def update_config(**kwargs) -> None:
 
 
 def load_config() -> Dict[str, Any]:
-    """Load roboduck config.
+    """Load roboduck config. The parsed file is cached by load_yaml and only
+    re-read when its mtime or size changes, so repeated calls cost a single
+    stat.
 
     Returns
     -------
     dict
     """
     config_path = get_config_path()
-    if not config_path.is_file():
+    try:
+        return load_yaml(path=config_path)
+    except FileNotFoundError:
         config_path.parent.mkdir(parents=True, exist_ok=True)
         config_path.touch()
-    return load_yaml(path=config_path)
+        return load_yaml(path=config_path)
 
 
 def apply_config_defaults(chat_kwargs: Dict[str, Any],
@@ -139,8 +161,14 @@ def apply_config_defaults(chat_kwargs: Dict[str, Any],
     Returns
     -------
     None
-        Update happens in place (if at all).
+        Update happens in place (if at all). When template_only=True, we also
+        set chat_kwargs[DEFAULTS_APPLIED_KEY] = True. The next call on the
+        same kwargs pops that marker and returns immediately, since user
+        kwargs always take priority over the config anyway.
     """
+    if chat_kwargs.pop(DEFAULTS_APPLIED_KEY, False):
+        return
+
     # If both are true, it means the user has already explicitly passed in a
     # model name so we should NOT override it with our config default.
     if 'model_name' in chat_kwargs and not template_only:
@@ -153,6 +181,8 @@ def apply_config_defaults(chat_kwargs: Dict[str, Any],
     # set it to None, which could break things.
     if config_model_name:
         chat_kwargs['model_name'] = config_model_name
+    if template_only:
+        chat_kwargs[DEFAULTS_APPLIED_KEY] = True
 
 
 def set_openai_api_key(key: Optional[str] = None,
@@ -174,8 +204,17 @@ def set_openai_api_key(key: Optional[str] = None,
         If True, we update the roboduck yaml config file with the provided
         api key.
     """
+    global _last_api_key_set
+
     var_name = 'OPENAI_API_KEY'
-    key = key or os.environ.get(var_name, '')
+    env_key = os.environ.get(var_name, '')
+    key = key or env_key
+    # We've already validated and set this exact key and nobody has changed
+    # the env var since, so there's nothing left to do.
+    if key and key == _last_api_key_set and key == env_key \
+            and not update_config_:
+        return
+
     if not key:
         try:
             data = load_config()
@@ -201,6 +240,9 @@ def set_openai_api_key(key: Optional[str] = None,
             f'Are you sure it\'s correct? (Key is partially redacted in '
             f'warning to err on the side of caution.)'
         )
-    os.environ[var_name] = key
+    # Writing to os.environ calls putenv, so skip it if nothing changed.
+    if env_key != key:
+        os.environ[var_name] = key
+    _last_api_key_set = key
     if update_config_:
         update_config(**{var_name.lower(): key})
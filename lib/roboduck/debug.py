@@ -27,7 +27,6 @@ bubble_sort(nums)
 import cmd
 from functools import partial
 import inspect
-import ipynbname
 from langchain.callbacks.base import CallbackManager
 from pdb import Pdb
 import sys
@@ -349,7 +348,9 @@ class DuckDB(Pdb):
             file = inspect.getsourcefile(self.curframe.f_code)
             if file.startswith('<ipython'):
                 # If we're in ipython, ipynbname.path() throws a
-                # FileNotFoundError.
+                # FileNotFoundError. Imported here because ipynbname is slow
+                # to import and is only needed for this case.
+                import ipynbname
                 try:
                     full_code = load_ipynb(ipynbname.path())
                     res['file_type'] = 'jupyter notebook'
@@ -516,9 +517,11 @@ class DuckDB(Pdb):
                 f'Missing required kwarg(s): {only_in_expected}. {error_msg}'
             )
 
-        prompt = self.chat.user_message(key_=prompt_key,
-                                        **prompt_kwargs).content
+        # Only render the prompt here if we need to show it: the reply call
+        # below formats it again anyway.
         if verbose:
+            prompt = self.chat.user_message(key_=prompt_key,
+                                            **prompt_kwargs).content
             print(colored(prompt, 'red'))
 
         if not self.silent:
@@ -90,9 +90,11 @@ def typecheck(func_: Optional[Callable] = None,
                  for k, v in signature(func_).parameters.items()
                  if not v.annotation == Parameter.empty}
 
+    # Resolved once at decoration time rather than on every call.
+    type_items = tuple(types.items())
+
     @wraps(func_)
     def wrapper(*args, **kwargs):
-        sig = signature(wrapper)
         try:
             fargs = sig.bind(*args, **kwargs).arguments
         except TypeError as e:
@@ -107,12 +109,14 @@ def typecheck(func_: Optional[Callable] = None,
                 )
             else:
                 raise e
-        for k, v in types.items():
+        for k, v in type_items:
             if k in fargs and not isinstance(fargs[k], v):
                 raise TypeError(
                     f'{k} must be {str(v)}, not {type(fargs[k])}.'
                 )
         return func_(*args, **kwargs)
+
+    sig = signature(wrapper)
     return wrapper
 
 
@@ -157,26 +161,30 @@ def add_kwargs(func: Callable, fields: List[str],
             'hide_fields. Otherwise the user can still pass in those args.'
         )
     sig = signature(wrapper)
-    params_ = {k: v for k, v in sig.parameters.items()}
-
-    # Remove any fields we want to hide.
     for field in hide_fields:
-        if field not in params_:
+        if field not in sig.parameters:
             warnings.warn(f'No need to hide field {field} because it\'s not '
                           'in the existing function signature.')
-        elif params_.pop(field).default == Parameter.empty:
-            raise TypeError(
-                f'Field "{field}" is not a valid hide_field because it has '
-                'no default value in the original function.'
-            )
 
-    if getattr(params_.pop('kwargs', None), 'kind') != Parameter.VAR_KEYWORD:
+    # Build the new parameter list in one pass: drop hidden fields and
+    # **kwargs, keep everything else in its original order.
+    params_ = []
+    var_kwargs = None
+    for name, param in sig.parameters.items():
+        if name in hide_fields:
+            if param.default == Parameter.empty:
+                raise TypeError(
+                    f'Field "{name}" is not a valid hide_field because it has '
+                    'no default value in the original function.'
+                )
+        elif param.kind == Parameter.VAR_KEYWORD:
+            var_kwargs = param
+        else:
+            params_.append(param)
+
+    if var_kwargs is None:
         raise TypeError(f'Function {func} must accept **kwargs.')
-    new_params = {
-        field: Parameter(field, Parameter.KEYWORD_ONLY)
-        for field in fields
-    }
-    overlap = set(new_params) & set(params_)
+    overlap = set(fields) & {param.name for param in params_}
     if overlap:
         raise RuntimeError(
             f'Some of the kwargs you tried to inject into {func} already '
@@ -184,10 +192,9 @@ def add_kwargs(func: Callable, fields: List[str],
             'unclear how to resolve default values and parameter type.'
         )
 
-    params_.update(new_params)
-    wrapper.__signature__ = sig.replace(
-        parameters=params_.values()  # type: ignore
-    )
+    wrapper.__signature__ = sig.replace(parameters=params_ + [
+        Parameter(field, Parameter.KEYWORD_ONLY) for field in fields
+    ])
     if strict:
         # In practice langchain checks for this anyway if we ask for a
         # completion, but outside of that context we need typecheck
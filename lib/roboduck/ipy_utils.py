@@ -1,15 +1,13 @@
 """Functions related to loading, saving, or otherwise working with ipython
 sessions or jupyter notebooks.
 """
-import hashlib
+from functools import lru_cache
 import json
-import re
-import secrets
+import os
 import time
 from pathlib import Path
 from typing import List, Optional, Tuple, Union
 
-import ipynbname
 from IPython import get_ipython
 from IPython.core.display import display, Javascript
 from IPython.core.interactiveshell import InteractiveShell
@@ -39,6 +37,9 @@ def load_ipynb(path: Path, save_if_self: bool = True) -> str:
         and separated by newlines.
     """
     if save_if_self:
+        # Deferred because ipynbname pulls in ipykernel, which noticeably
+        # slows down importing roboduck.
+        import ipynbname
         try:
             self_path = ipynbname.path()
         except FileNotFoundError:
@@ -50,15 +51,15 @@ def load_ipynb(path: Path, save_if_self: bool = True) -> str:
     with open(path, 'r') as f:
         cells = json.load(f)['cells']
 
-    cell_str = ''
+    parts = []
     for cell in cells:
         if not cell['source']:
             continue
         source = '\n' + ''.join(cell['source']) + '\n'
         if cell['cell_type'] == 'code':
             source = '\n```' + source + '```\n'
-        cell_str += source
-    return cell_str
+        parts.append(source)
+    return ''.join(parts)
 
 
 def load_current_ipython_session(formatted: bool = True) -> Union[List, str]:
@@ -91,15 +92,13 @@ def load_current_ipython_session(formatted: bool = True) -> Union[List, str]:
     -------
     list or str
     """
+    # Read straight from the history manager rather than having %history
+    # write to a temp file and parsing it back. raw=False matches what
+    # %history shows by default (i.e. magics are translated to python).
     shell = get_ipython()
-    path = Path('/tmp')/f'{secrets.token_hex(24)}.txt'
-    shell.magic(f'%history -n -f {path}')
-    with open(path, 'r') as f:
-        res = f.read()
-    path.unlink()
     cells = []
-    for row in res.splitlines():
-        content = row.partition(':')[-1].strip()
+    for _, _, content in shell.history_manager.get_range(raw=False):
+        content = content.strip()
         if content:
             cells.append(content)
     if formatted:
@@ -142,12 +141,17 @@ def is_ipy_name(
     bool
         True if it looks like an ipython output cell name, False otherwise.
     """
-    # First check if it fits the standard leading underscore format.
-    # Easier to handle the "only underscores" case separately because we want
-    # to limit the number of underscores for names like "_i3".
-    pat = '^_{1,2}i?\\d*$'
-    is_under = bool(re.match(pat, name)) or not name.strip('_')
-    return is_under or name in count_as_true
+    if name in count_as_true or not name.strip('_'):
+        return True
+    # Standard format is 1-2 underscores, an optional "i", then digits. This
+    # gets called on every local var in a frame so we check chars directly
+    # rather than going through the regex engine.
+    if name[0] != '_':
+        return False
+    i = 2 if name[1:2] == '_' else 1
+    if name[i:i + 1] == 'i':
+        i += 1
+    return i == len(name) or name[i:].isdecimal()
 
 
 def save_notebook(file_path: Union[str, Path]) -> None:
@@ -161,18 +165,17 @@ def save_notebook(file_path: Union[str, Path]) -> None:
     file_path : str or Path
         Path to notebook that you want to save.
     """
-    def file_md5(path):
-        with open(path, 'rb') as f:
-            text = f.read()
-        return hashlib.md5(text).hexdigest()
-
-    start_md5 = file_md5(file_path)
+    def file_state(path):
+        # Jupyter rewrites the file on save, which updates the mtime. A stat
+        # is O(1) regardless of notebook size, unlike hashing the contents,
+        # so we can afford to poll much more often.
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    start_state = file_state(file_path)
     display(Javascript('IPython.notebook.save_checkpoint();'))
-    current_md5 = start_md5
-
-    while start_md5 == current_md5:
-        time.sleep(1)
-        current_md5 = file_md5(file_path)
+    while file_state(file_path) == start_state:
+        time.sleep(0.05)
 
 
 def is_colab(shell: Optional[InteractiveShell] = None) -> bool:
@@ -185,4 +188,12 @@ def is_colab(shell: Optional[InteractiveShell] = None) -> bool:
         between colab and jupyter.
     """
     shell = shell or get_ipython()
-    return 'google.colab' in str(type(shell))
+    return _is_colab_shell_type(type(shell))  # type: ignore
+
+
+@lru_cache(maxsize=4)
+def _is_colab_shell_type(shell_type: type) -> bool:
+    """Cached by shell class since a session's shell never changes type, so
+    repeated is_colab calls (e.g. on each %duck) skip the str() formatting.
+    """
+    return 'google.colab' in str(shell_type)
@@ -7,7 +7,7 @@ from functools import partial
 from langchain.callbacks.base import CallbackManager
 from langchain.chat_models import ChatOpenAI
 from langchain.schema import ChatResult, ChatGeneration, AIMessage, \
-    BaseMessage, SystemMessage
+    BaseMessage, HumanMessage, LLMResult, SystemMessage
 from langchain.prompts import HumanMessagePromptTemplate
 from typing import Dict, List, Optional, Set, Tuple, Type, Union
 import warnings
@@ -27,6 +27,7 @@ class DummyChatModel:
     def __init__(self, **kwargs):
         self.__dict__.update(kwargs)
         self.verbose = getattr(self, 'verbose', True)
+        self._async_warned = False
 
     def __call__(self, messages: List[BaseMessage],
                  stop: Optional[List[str]] = None) -> BaseMessage:
@@ -53,12 +54,27 @@ class DummyChatModel:
             generations=[ChatGeneration(message=message)]  # type: ignore
         )
 
+    def generate(self, messages: List[List[BaseMessage]],
+                 stop: Optional[List[str]] = None) -> LLMResult:
+        # Mirrors langchain's BaseChatModel.generate. There's no real api
+        # call so token usage is always empty.
+        results = [self._generate(m, stop=stop) for m in messages]
+        return LLMResult(
+            generations=[res.generations for res in results],
+            llm_output={'token_usage': {}}
+        )
+
     async def _agenerate(self, messages: List[BaseMessage],
                          stop: Optional[List[str]] = None):
-        warnings.warn(
-            f'{type(self).__name__} doesn\'t provide a real _agenerate '
-            'method. Calling synchronous generate() instead.'
-        )
+        # Only warn once per instance - async test loops may call this many
+        # times.
+        if not self._async_warned:
+            warnings.warn(
+                f'{type(self).__name__} doesn\'t provide a real _agenerate '
+                'method. Calling synchronous generate() instead.',
+                stacklevel=2
+            )
+            self._async_warned = True
         return self._generate(messages, stop=stop)
 
 
@@ -131,16 +147,21 @@ class Chat:
         )
         ```
         """
-        self.kwargs = dict(kwargs)
-        self.kwargs.update(streaming=streaming)
+        self.kwargs = {**kwargs, 'streaming': streaming}
+        # No-op (aside from removing a marker key) if we were created via
+        # from_template, which already resolved the config defaults.
         apply_config_defaults(self.kwargs, template_only=False)
         if streaming and 'callback_manager' not in self.kwargs:
             self.kwargs['callback_manager'] = CallbackManager(
                 [LiveTypingCallbackHandler()]
             )
         self.chat = chat_class(**self.kwargs)
+        # If the user didn't specify a model, fall back to whatever the chat
+        # class uses by default (e.g. ChatOpenAI has a model_name field)
+        # rather than assuming the smallest context window.
         self.context_window = model_context_window(
             self.kwargs.get('model_name')
+            or getattr(self.chat, 'model_name', None)
         )
         # This is approximate and counts words, not tokens. It is soft in the
         # sense that it marks not where the user exceeds the model's context
@@ -159,10 +180,24 @@ class Chat:
             k: HumanMessagePromptTemplate.from_template(v)
             for k, v in user.items()
         }
+        # Raw template string and field names for each user message type.
+        # user_message formats with these directly: langchain's
+        # StrictFormatter is a pure python string.Formatter, which is much
+        # slower than the builtin str.format.
+        self._user_formats = {
+            k: (v.prompt.template, frozenset(v.input_variables))
+            for k, v in self.user_templates.items()
+        }
         self.default_user_key = next(iter(self.user_templates))
         self.default_user_fields = (self.user_templates[self.default_user_key]
                                     .input_variables)
         self._history = list(history) or [self.system_message]
+        # Token usage reported by the provider for the most recent reply
+        # (empty in streaming mode, where openai doesn't report usage), plus a
+        # running count of prompt tokens served from the provider's prompt
+        # cache. Useful for checking if a template's layout gets cache hits.
+        self.last_usage = {}
+        self.cached_tokens_total = 0
         self._create_reply_methods()
 
     def _create_reply_methods(self):
@@ -218,16 +253,17 @@ class Chat:
         """
         template = load_template(name)
         # Important that we call this BEFORE taking user kwargs into account.
-        # Init will handle the resolution that occurs afterwards, do not make
-        # a second call to apply defaults in this method.
+        # This leaves a marker in the kwargs so init knows it doesn't need to
+        # load the config again - do not make a second call to apply defaults
+        # in this method.
         apply_config_defaults(template['kwargs'], template_only=True)
         if kwargs:
             template['kwargs'].update(kwargs)
         kwargs = template.pop('kwargs', {})
         return cls(**template, **kwargs)
 
-    def user_message(self, *, key_: str = '', **kwargs) -> str:
-        """Get a fully resolved user reply as a string.
+    def user_message(self, *, key_: str = '', **kwargs) -> HumanMessage:
+        """Get a fully resolved user reply.
 
         Parameters
         ----------
@@ -239,11 +275,20 @@ class Chat:
 
         Returns
         -------
-        str
+        HumanMessage
+            Use the `content` attribute to get the message as a str.
         """
         key = key_ or self.default_user_key
-        template = self.user_templates[key]
-        return template.format(**kwargs)
+        template, fields = self._user_formats[key]
+        # Match langchain's StrictFormatter, which rejects unused kwargs.
+        # Missing kwargs raise a KeyError from str.format itself.
+        extra = kwargs.keys() - fields
+        if extra:
+            raise KeyError(extra)
+        return HumanMessage(
+            content=template.format(**kwargs),
+            additional_kwargs=self.user_templates[key].additional_kwargs
+        )
 
     def _reply(self, *, key_: str = '', **kwargs) -> AIMessage:
         """The basic functionality that will underlie the dynamically generated
@@ -267,13 +312,32 @@ class Chat:
         self._history.append(user_message)
         self._truncate_history()
         try:
-            response = self.chat(self._history)
+            # Use generate rather than __call__ so we get token usage too.
+            result = self.chat.generate([self._history])
         except Exception as e:
             self._history.pop(-1)
             raise e
+        self._update_usage(result.llm_output)
+        response = result.generations[0][0].message
         self._history.append(response)
         return response
 
+    def _update_usage(self, llm_output: Optional[Dict]) -> None:
+        """Store token usage from the most recent LLM response and update our
+        running count of cached prompt tokens.
+
+        Parameters
+        ----------
+        llm_output : dict or None
+            The llm_output attribute of a langchain LLMResult. For openai
+            models, this looks like {'token_usage': {'prompt_tokens': 1200,
+            'prompt_tokens_details': {'cached_tokens': 1024}, ...}}.
+        """
+        usage = (llm_output or {}).get('token_usage') or {}
+        self.last_usage = dict(usage)
+        details = usage.get('prompt_tokens_details') or {}
+        self.cached_tokens_total += details.get('cached_tokens') or 0
+
     def history(self, sep: str = '\n\n', speaker_prefix: bool = True) -> str:
         """Return chat history as a single string.
 
@@ -320,10 +384,20 @@ class Chat:
         acceptable size for our LLM's context window. Operates in place. Called
         automatically by _reply.
         """
+        # Each turn's word count (+1 for the speaker prefix) is at most
+        # len(content) + 2, so if even that upper bound fits we can skip
+        # counting entirely. This is the common case for the first few turns
+        # of a debugging session.
+        if sum(len(row.content) + 2 for row in self._history) \
+                <= self.prompt_words_soft_limit:
+            return
+
         # Technically I don't think this is the exact prompt that gets sent
         # but it's close enough for our estimate. We're doing some pretty rough
-        # arithmetic anyway with the token->word conversions.
-        n_words = len(self.history(sep='\n').split())
+        # arithmetic anyway with the token->word conversions. Count each turn
+        # separately (+1 for the speaker prefix that history() would add)
+        # rather than joining the whole transcript into one big string first.
+        n_words = sum(len(row.content.split()) + 1 for row in self._history)
         while n_words > self.prompt_words_hard_limit:
             if len(self._history) <= 2:
                 raise ValueError(
@@ -1,9 +1,17 @@
 """Miscellaneous functions to help us interact with langchain."""
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional
 
 
-MODEL_CONTEXT_WINDOWS = {
+# Read-only because model_context_window caches its results, so mutating
+# this at runtime would silently leave stale values in the cache.
+MODEL_CONTEXT_WINDOWS = MappingProxyType({
     'gpt-3.5-turbo': 16_385,
     'gpt-4': 8_192,
+    'gpt-4-32k': 32_768,
+    'gpt-4-0125-preview': 128_000,
+    'gpt-4-1106-preview': 128_000,
     'gpt-4-turbo': 128_000,
     'gpt-4o': 128_000,
     'gpt-4o-mini': 128_000,
@@ -14,28 +22,50 @@ MODEL_CONTEXT_WINDOWS = {
     # supported in roboduck v1 because they never gave me api access so I can't
     # test it. 🤷‍♂️.
     # 'claude': 8_000,
-}
+})
+# Used when we don't recognize a model name. Smallest window is the safest
+# assumption.
+DEFAULT_CONTEXT_WINDOW = min(MODEL_CONTEXT_WINDOWS.values())
+# Longest first so prefix matching picks the most specific model family.
+_NAMES_LONGEST_FIRST = tuple(sorted(MODEL_CONTEXT_WINDOWS, key=len,
+                                    reverse=True))
 
 
+@lru_cache(maxsize=64)
 def model_context_window(
-    model_name: str,
-    default: int = min(MODEL_CONTEXT_WINDOWS.values())
+    model_name: Optional[str],
+    default: int = DEFAULT_CONTEXT_WINDOW
 ) -> int:
     """Get context window (int) for a given model name. Relies on
     MODEL_CONTEXT_WINDOWS var in this module being updated manually.
 
+    Date-stamped model names (e.g. 'gpt-4-0613' or 'gpt-4o-mini-2024-07-18')
+    resolve to the longest key in MODEL_CONTEXT_WINDOWS that they start with,
+    so 'gpt-4-0613' gets the 'gpt-4' window while 'gpt-4o-2024-05-13' gets the
+    'gpt-4o' window. Results are cached (MODEL_CONTEXT_WINDOWS is read-only
+    so they can't go stale).
+
     Parameters
     ----------
-    model_name : str
+    model_name : str or None
         Model name to pass to langchain chat_class, e.g. 'gpt-3.5-turbo'.
         Typically specified in a prompt yaml file.
     default : int
-        What to return if the model name isn't found in MODEL_CONTEXT_WINDOWS.
-        Technically you could set this to any type (e.g. you could also
-        choose to return None or float('inf') if the name was missing).
+        What to return if the model name isn't found in MODEL_CONTEXT_WINDOWS
+        (or is None). Technically you could set this to any type (e.g. you
+        could also choose to return None or float('inf') if the name was
+        missing).
 
     Returns
     -------
     int
     """
-    return MODEL_CONTEXT_WINDOWS.get(model_name, default)
+    if not model_name:
+        return default
+    window = MODEL_CONTEXT_WINDOWS.get(model_name)
+    if window is not None:
+        return window
+    for name in _NAMES_LONGEST_FIRST:
+        if model_name.startswith(name + '-'):
+            return MODEL_CONTEXT_WINDOWS[name]
+    return default
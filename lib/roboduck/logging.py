@@ -23,6 +23,11 @@ from typing import Dict, Optional, Tuple, Union
 import warnings
 
 
+# Formatters don't hold any per-handler state, so loggers that share a format
+# string (usually the default) can share a Formatter too.
+_FORMATTER_CACHE: Dict[str, Formatter] = {}
+
+
 class DuckLogger(Logger):
     """Replacement for logging.Logger class that uses our errors module to
     log natural language explanations and fixes along with the original error.
@@ -30,6 +35,10 @@ class DuckLogger(Logger):
     message in the original exception before logging.)
     """
 
+    # Populated with the roboduck.errors module the first time we log an
+    # exception (see _log for why we don't import it at the top level).
+    _errors = None
+
     def __init__(self, name: str, colordiff: bool = False,
                  fmt: str = '%(asctime)s [%(levelname)s]: %(message)s',
                  stdout: bool = True,
@@ -81,13 +90,16 @@ class DuckLogger(Logger):
         # If stdout=True, our super()._log() call still ensures that we log to
         # stdout after the gpt call completes.
         defaults = dict(auto=True, sleep=0, silent=True, interactive=False)
-        for k, v in defaults.items():
-            if self.excepthook_kwargs.get(k, v) != v:
-                warnings.warn(
-                    f'You tried to set {k}={self.excepthook_kwargs[k]} '
-                    f'but it must equal {v} in logger. Your arg will be'
-                    f'overridden.'
-                )
+        overridden = [
+            f'{k}={self.excepthook_kwargs[k]!r} (must be {v!r})'
+            for k, v in defaults.items()
+            if self.excepthook_kwargs.get(k, v) != v
+        ]
+        if overridden:
+            warnings.warn(
+                f'These logger kwargs have required values and will be '
+                f'overridden: {", ".join(overridden)}.'
+            )
         self.excepthook_kwargs.update(defaults)
         self.excepthook_kwargs['colordiff'] = self.excepthook_kwargs.get(
             'colordiff', colordiff
@@ -97,7 +109,9 @@ class DuckLogger(Logger):
     def _add_handlers(self, fmt: str, stdout: bool, path: Union[str, Path],
                       fmode: str) -> None:
         """Set up handlers to log to stdout and/or a file."""
-        formatter = Formatter(fmt)
+        formatter = _FORMATTER_CACHE.get(fmt)
+        if formatter is None:
+            formatter = _FORMATTER_CACHE[fmt] = Formatter(fmt)
         handlers = []
         if stdout:
             handlers.append(StreamHandler(sys.stdout))
@@ -107,8 +121,12 @@ class DuckLogger(Logger):
             self.propagate = False
 
         if path:
-            path = Path(path).resolve()
-            os.makedirs(path.parent, exist_ok=True)
+            # abspath is enough here: FileHandler doesn't care about
+            # symlinks and resolve() would stat every path component.
+            path = os.path.abspath(os.fspath(path))
+            parent = os.path.dirname(path)
+            if not os.path.isdir(parent):
+                os.makedirs(parent, exist_ok=True)
             handlers.append(FileHandler(path, fmode))  # type: ignore
         for handler in handlers:
             handler.setFormatter(formatter)
@@ -125,9 +143,17 @@ class DuckLogger(Logger):
         Low-level logging routine which creates a LogRecord and then calls
         all the handlers of this logger to handle the record.
         """
-        if isinstance(msg, Exception) and sys.exc_info()[2]:
-            from roboduck import errors
-            errors.excepthook(type(msg), msg, msg.__traceback__,
+        # Checking the exception's own traceback (rather than
+        # sys.exc_info()) avoids building a 3-tuple on every log call and
+        # means a previously raised exception still gets explained if it's
+        # logged outside its except block.
+        tb = getattr(msg, '__traceback__', None)
+        if tb is not None and isinstance(msg, Exception):
+            errors = type(self)._errors
+            if errors is None:
+                from roboduck import errors
+                type(self)._errors = errors
+            errors.excepthook(type(msg), msg, tb,
                               **self.excepthook_kwargs)
             msg = sys.last_value
             errors.disable()
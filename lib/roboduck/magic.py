@@ -23,10 +23,12 @@ nums.add(4)
 ```
 """
 
+from functools import lru_cache
 from IPython import get_ipython
 from IPython.core.magic import line_magic, magics_class, Magics
 from IPython.core.magic_arguments import argument, magic_arguments, \
     parse_argstring
+import os
 import sys
 import warnings
 
@@ -34,6 +36,10 @@ from roboduck.debug import CodeCompletionCache
 from roboduck.ipy_utils import is_colab
 
 
+# Whether we've already shown the custom prompt warning this session.
+_prompt_warned = False
+
+
 @magics_class
 class DebugMagic(Magics):
     """Enter a conversational debugging session after an error is thrown by a
@@ -90,19 +96,24 @@ class DebugMagic(Magics):
         Not certain this would be an improvement, and major refactor might be
         needed to make this work, but it's something to keep in mind.
         """
-        args = parse_argstring(self.duck, line)
-        if args.prompt:
+        global _prompt_warned
+
+        args = _parse_line(line)
+        if args.prompt and not _prompt_warned:
             warnings.warn('Support for custom prompts is somewhat limited '
                           'at the moment - your prompt must use the default '
                           'parse_func (roboduck.utils.parse_completion).')
+            _prompt_warned = True
         if args.p and is_colab(self.shell):
             warnings.warn('Paste mode is unavailable in google colab, which '
                           'you appear to be using. Ignoring -p flag.')
         try:
             # Confine this import to this method rather than keeping a top
-            # level import because importing this module overwrites
-            # sys.excepthook which we don't necessarily want when
-            # importing this module.
+            # level import because importing roboduck.errors overwrites
+            # sys.excepthook, which we don't want when merely importing this
+            # module. Import inside the try so the finally block always
+            # restores the original hook.
+            from roboduck import errors
             # Note that this uses the `debug_stack_trace` prompt by default.
             # This does NOT include a user question param in the contextful
             # prompt, but in this setting we only use that method once (for our
@@ -113,10 +124,9 @@ class DebugMagic(Magics):
             # a user question) is used from that point forward.
             # Color should be specified because errors module uses red
             # by default (whereas debug module uses green).
-            from roboduck import errors
             kwargs = {'auto': True, 'interactive': args.i, 'color': 'green'}
             if args.prompt:
-                kwargs['prompt'] = args.prompt
+                kwargs['prompt_name'] = args.prompt
             errors.excepthook(sys.last_type, sys.last_value,  # type: ignore
                               sys.last_traceback, **kwargs)
         except Exception as e:
@@ -131,4 +141,27 @@ class DebugMagic(Magics):
         CodeCompletionCache.reset_class_vars()
 
 
-get_ipython().register_magics(DebugMagic)
+@lru_cache(maxsize=32)
+def _parse_line(line: str):
+    """Parse %duck's argument string. Users tend to rerun the same few flag
+    combinations, so cache the result rather than running argparse every
+    time. The returned namespace is shared between calls - don't mutate it.
+    """
+    return parse_argstring(DebugMagic.duck, line)
+
+
+def _register() -> None:
+    """Register the %duck magic with the active IPython shell. This is a no-op
+    outside of IPython so that importing this module elsewhere (e.g. to
+    generate docs) has no side effects. Users can also set the
+    ROBODUCK_NO_MAGIC environment variable to skip registration inside
+    IPython (e.g. when running tests under IPython).
+    """
+    if os.environ.get('ROBODUCK_NO_MAGIC'):
+        return
+    shell = get_ipython()
+    if shell is not None:
+        shell.register_magics(DebugMagic)
+
+
+_register()
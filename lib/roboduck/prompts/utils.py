@@ -1,14 +1,49 @@
 """Utilities for working with prompts (usually prompt templates, to be more
 precise).
 """
+from functools import lru_cache
+import os
 from pathlib import Path
 
 from roboduck.utils import load_yaml
 
 
 PROMPT_DIR = Path(__file__).parent
-VALID_MODES = set(p.name for p in PROMPT_DIR.iterdir() if p.is_dir()
-                  and not p.name.startswith('_'))
+
+
+@lru_cache(maxsize=1)
+def _valid_modes():
+    """Prompt modes (subdirs of PROMPT_DIR, e.g. "chat"). Computed on first
+    use rather than at import so importing roboduck doesn't scan the
+    directory. scandir's entries cache is_dir() from the directory listing,
+    so this doesn't need a stat per entry.
+    """
+    with os.scandir(PROMPT_DIR) as entries:
+        return frozenset(entry.name for entry in entries if entry.is_dir()
+                         and not entry.name.startswith('_'))
+
+
+def __getattr__(name):
+    # Keep VALID_MODES available as a module attribute without computing it
+    # at import time.
+    if name == 'VALID_MODES':
+        return _valid_modes()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+@lru_cache(maxsize=None)
+def _prompt_names(mode):
+    """Names of the prompt templates for one mode. Cached because the
+    directory contents don't change within a session (see
+    available_templates.cache_clear if you add prompts on the fly).
+    """
+    # Ignore files like __template__.yaml.
+    with os.scandir(PROMPT_DIR/mode) as entries:
+        return frozenset(entry.name[:-5] for entry in entries
+                         if entry.name.endswith('.yaml')
+                         and len(entry.name) > 5
+                         and not entry.name.startswith('__')
+                         and entry.is_file())
 
 
 def available_templates(mode=''):
@@ -30,26 +65,59 @@ def available_templates(mode=''):
         (notice file extension is excluded). If a non-empty string is provided,
         we only return the set of strings for the given mode, e.g. only the
         available chat prompts if mode='chat'.
-    """
-    def _prompt_names_in_dir(dir_):
-        # Ignore files like __template__.yaml.
-        return set(path.stem for path in dir_.iterdir()
-                   if path.suffix == '.yaml'
-                   and not path.stem.startswith('__'))
 
+    Notes
+    -----
+    Directory listings are cached for the life of the process. If you add
+    prompt files to the roboduck package while it's running, call
+    `available_templates.cache_clear()` to pick them up.
+    """
     assert isinstance(mode, str), f'Mode should be type str, not {type(mode)}.'
-    keys = [mode] if mode else VALID_MODES
+    valid_modes = _valid_modes()
+    keys = [mode] if mode else valid_modes
     for key in keys:
-        if key not in VALID_MODES:
+        if key not in valid_modes:
             raise ValueError(
                 f'Encountered unrecognized key "{key}". This might mean you '
-                f'specified an invalid mode. Valid modes are: {VALID_MODES}.'
+                f'specified an invalid mode. Valid modes are: {valid_modes}.'
             )
 
-    res = {key: _prompt_names_in_dir(PROMPT_DIR/key) for key in keys}
+    # Return fresh sets so callers can't mutate the cached ones.
+    res = {key: set(_prompt_names(key)) for key in keys}
     return next(iter(res.values())) if len(keys) == 1 else res
 
 
+available_templates.cache_clear = _prompt_names.cache_clear
+
+
+def _resolve(name, mode):
+    """Map a prompt name or user-provided file path to an absolute path.
+
+    Parameters
+    ----------
+    name : str or Path
+        See load_template.
+    mode : str
+        See load_template.
+
+    Returns
+    -------
+    Path
+    """
+    templates = available_templates(mode=mode)
+    if name in templates:
+        return PROMPT_DIR/f'{mode}/{name}.yaml'
+    path = Path(name).expanduser()
+    if path.is_file():
+        return path.resolve()
+    raise ValueError(
+        f'`name` must either be a built-in roboduck prompt or a path to '
+        f'a yaml file on your machine. "{name}" appears to be neither. '
+        f'For your requested mode "{mode}", available options are: '
+        f'{templates}.'
+    )
+
+
 def load_template(name, mode='chat'):
     """Load prompt template from the roboduck library or a user-provided yaml
     file.
@@ -85,16 +153,7 @@ def load_template(name, mode='chat'):
         message types are provided, the first one in the dict will be used as
         the default.
     """
-    templates = available_templates(mode=mode)
-    if name in templates:
-        path = PROMPT_DIR/f'{mode}/{name}.yaml'
-    elif Path(name).expanduser().is_file():
-        path = Path(name)
-    else:
-        raise ValueError(
-            f'`name` must either be a built-in roboduck prompt or a path to '
-            f'a yaml file on your machine. "{name}" appears to be neither. '
-            f'For your requested mode "{mode}", available options are: '
-            f'{templates}.'
-        )
-    return load_yaml(path)
+    # load_yaml caches parsed files and hands back a deep copy, which matters
+    # because callers (e.g. Chat.from_template) update the nested kwargs dict
+    # in place.
+    return load_yaml(_resolve(name, mode))
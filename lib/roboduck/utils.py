@@ -2,15 +2,46 @@
 
 from collections.abc import Iterable
 from colorama import Fore, Style
+from copy import deepcopy
 import difflib
 from functools import wraps
-import openai
+from itertools import islice
 import os
 from pathlib import Path
-import re
-from typing import Any, Callable, Dict, List, Optional, Union
+import shutil
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 import yaml
 
+# Libyaml-backed loader/dumper are much faster than the pure python ones but
+# are only available if pyyaml was built with libyaml.
+try:
+    from yaml import CSafeLoader as _YamlLoader, CSafeDumper as _YamlDumper
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader  # type: ignore
+    from yaml import SafeDumper as _YamlDumper  # type: ignore
+
+# Lowercase colorama color name (e.g. "green") -> ansi code. Built once since
+# colored is called for every character when live typing.
+_COLOR_CODES = {name.lower(): code for name, code in vars(Fore).items()}
+_RESET_CODE = Style.RESET_ALL
+# Used by format_listlike_with_metadata to re-close truncated reprs.
+_OPEN2CLOSE = {
+    '(': ')',
+    '{': '}',
+    '[': ']',
+}
+_CLOSING_BRACKETS = frozenset(_OPEN2CLOSE.values())
+# Distinguishes "arg not passed" from falsy values like None in fallback.
+_MISSING = object()
+# Seconds that available_models reuses a previous response for.
+AVAILABLE_MODELS_TTL = 3600
+# Maps absolute yaml path -> (st_mtime_ns, st_size, parsed contents). Lets
+# load_yaml skip parsing when a file hasn't changed since the last read.
+_yaml_cache: Dict[str, Tuple[int, int, Dict]] = {}
+# Maps api key -> (time.monotonic() of fetch, available_models result).
+_available_models_cache: Dict[Optional[str], Tuple[float, Dict]] = {}
+
 
 def colored(text: str, color: str) -> str:
     """Add tags to color text and then reset color afterwards. Note that this
@@ -33,11 +64,20 @@ def colored(text: str, color: str) -> str:
     """
     if not color:
         return text
-    color = getattr(Fore, color.upper())
-    return f'{color}{text}{Style.RESET_ALL}'
-
-
-def colordiff_new_str(old: str, new: str, color: str = 'green') -> str:
+    try:
+        prefix = _COLOR_CODES[color]
+    except KeyError:
+        prefix = _COLOR_CODES.get(color.lower())
+        if prefix is None:
+            raise ValueError(
+                f'Unrecognized color "{color}". Valid options are: '
+                f'{sorted(_COLOR_CODES)}.'
+            ) from None
+    return prefix + text + _RESET_CODE
+
+
+def colordiff_new_str(old: str, new: str, color: str = 'green',
+                      granularity: str = 'line') -> str:
     """Given two strings, return the new one with new parts in green. Note that
     deletions are ignored because we want to retain only characters in the new
     string. Remember colors are only displayed correctly when printing the
@@ -58,18 +98,47 @@ def colordiff_new_str(old: str, new: str, color: str = 'green') -> str:
         Determines content of output str.
     color : str
         Text color for new characters.
+    granularity : str
+        Either 'line' or 'char'. 'line' compares whole lines, so any line
+        that changed at all is colored in full. 'char' highlights exactly
+        which characters changed but SequenceMatcher is quadratic in the
+        number of elements compared, so it gets slow on long snippets.
 
     Returns
     -------
     str
         Same content as `new` but color new parts in a different color.
     """
+    if granularity not in ('line', 'char'):
+        raise ValueError(
+            f'granularity must be "line" or "char", not "{granularity}".'
+        )
+    # SequenceMatcher does the full comparison even for identical inputs,
+    # which is common when gpt returns the code unchanged.
+    if old == new:
+        return new
+    # Everything is new (e.g. there was no previous code snippet) or nothing
+    # is left, so there's nothing to diff.
+    if not old:
+        return colored(new, color)
+    if not new:
+        return ''
+
+    if granularity == 'line':
+        old_parts = old.splitlines(keepends=True)
+        new_parts = new.splitlines(keepends=True)
+    else:
+        old_parts, new_parts = old, new
     res = []
-    matcher = difflib.SequenceMatcher(None, old, new)
+    # Autojunk treats any element that makes up >1% of a 200+ element
+    # sequence as junk. In code that's spaces, newlines, or blank/closing
+    # lines, which leads to huge spurious "replace" blocks.
+    matcher = difflib.SequenceMatcher(None, old_parts, new_parts,
+                                      autojunk=False)
     for opcode, s1, e1, s2, e2 in matcher.get_opcodes():
         if opcode == 'delete':
             continue
-        chunk = new[s2:e2]
+        chunk = ''.join(new_parts[s2:e2])
         if opcode in ('insert', 'replace'):
             chunk = colored(chunk, color)
         res.append(chunk)
@@ -118,9 +187,12 @@ def is_array_like(obj: Any) -> bool:
     has certain attributes that those objects should have.
     If obj is the class itself rather than an instance, we return False.
     """
-    return all(hasattr(obj, attr)
-               for attr in ("ndim", "shape", "dtype", "tolist")) \
-            and not isinstance(obj, type)
+    # Chained checks rather than all() over a generator: most objects we see
+    # (lists, strs, etc.) fail the first hasattr, and this avoids creating a
+    # generator on every call.
+    return (not isinstance(obj, type) and hasattr(obj, 'ndim')
+            and hasattr(obj, 'shape') and hasattr(obj, 'dtype')
+            and hasattr(obj, 'tolist'))
 
 
 def qualname(obj: Any, with_brackets: bool = True) -> str:
@@ -130,13 +202,15 @@ def qualname(obj: Any, with_brackets: bool = True) -> str:
 
     Set with_brackets=False to skip the leading/trailing angle brackets.
     """
-    text = str(type(obj))
-    names = re.search("<class '([a-zA-Z_.]*)'>", text).groups()
-    assert len(names) == 1, f'Should have found only 1 qualname but ' \
-                            f'found: {names}'
+    cls = type(obj)
+    # Matches str(cls), which leaves out the module for builtins.
+    if cls.__module__ == 'builtins':
+        name = cls.__qualname__
+    else:
+        name = f'{cls.__module__}.{cls.__qualname__}'
     if with_brackets:
-        return f'<{names[0]}>'
-    return names[0]
+        return f'<{name}>'
+    return name
 
 
 def format_listlike_with_metadata(
@@ -173,12 +247,6 @@ def format_listlike_with_metadata(
     >>> format_listlike_with_metadata(series, series[:2])
     "<pandas.core.series.Series, truncated_data=['a', 'b', ...], len=5>"
     """
-    open2close = {
-        '(': ')',
-        '{': '}',
-        '[': ']',
-    }
-    closing_bracket_str = ''.join(open2close.values())
     clsname = qualname(array, with_brackets=False)
     res = f"<{clsname}, truncated_data="
     if truncated_data is None:
@@ -189,8 +257,10 @@ def format_listlike_with_metadata(
             res += truncated_data
         else:
             repr_ = repr(truncated_data.tolist())
-            res += f"{repr_[:-1] + repr_[-1].rstrip(closing_bracket_str)}, " \
-                   f"...{open2close.get(repr_[0], '')}"
+            closing = _OPEN2CLOSE.get(repr_[0], '')
+            if repr_[-1] in _CLOSING_BRACKETS:
+                repr_ = repr_[:-1]
+            res += f"{repr_}, ...{closing}"
         res += f", shape={array.shape}, dtype={array.dtype}>"
         return res
 
@@ -206,37 +276,101 @@ def format_listlike_with_metadata(
         repr_ = repr(truncated_data)
         # If the last char is a closing brace, we want to strip it. But we
         # don't want to strip multiple closing braces, e.g. [(3, 4), (5, 6)].
-        res += f"{repr_[:-1] + repr_[-1].rstrip(closing_bracket_str)}, " \
-                f"...{open2close.get(repr_[0], '')}"
+        closing = _OPEN2CLOSE.get(repr_[0], '')
+        if repr_[-1] in _CLOSING_BRACKETS:
+            repr_ = repr_[:-1]
+        res += f"{repr_}, ...{closing}"
     return res + f", len={len(array)}>"  # type: ignore
 
 
-def fallback(*, default: Optional[Any] = None,
-             default_func: Optional[Callable] = None) -> Callable:
+def fallback(*, default: Any = _MISSING,
+             default_func: Any = _MISSING) -> Callable:
     """Decorator to provide a default value (or function that produces a value)
     to return when the decorated function's execution fails.
 
     You must specify either default OR default_func, not both. If default_func
     is provided, it should accept the same args as the decorated function.
+    Falsy defaults like None, 0, or '' are allowed.
     """
-    if bool(default) + bool(default_func) != 1:
-        raise ValueError('Exactly 1 of ()`default`, `default_func`) args '
-                         'must be non-None.')
+    if (default is _MISSING) == (default_func is _MISSING):
+        raise ValueError('Exactly 1 of (`default`, `default_func`) args '
+                         'must be provided.')
 
     def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                if default is not None:
+        # Pick the wrapper once here so the except block doesn't need to
+        # check which arg was provided on every failure.
+        if default_func is _MISSING:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
                     return default
-                return default_func(*args, **kwargs)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    return default_func(*args, **kwargs)
         return wrapper
 
     return decorator
 
 
+def _head(obj: Iterable, n: int) -> Iterable:
+    """Get the first n items of a sliceable object, set, or dict (as a list of
+    (key, value) pairs). Sets stay sets so their repr keeps the right
+    brackets.
+    """
+    # islice so we only walk the first n items rather than copying the whole
+    # (possibly huge) set or dict into a list first.
+    if isinstance(obj, set):
+        return set(islice(obj, n))
+    if isinstance(obj, dict):
+        return list(islice(obj.items(), n))
+    return obj[:n]  # type: ignore
+
+
+def _n_items_that_fit(obj: Union[list, tuple, set, dict],
+                      max_len: int) -> int:
+    """Count how many leading items of a builtin container fit in a repr of
+    about max_len characters, accumulating one item repr at a time so we only
+    repr the items we actually need. Always returns at least 1. Dicts are
+    measured as (key, value) pairs to match how truncated_repr displays them.
+    """
+    items = obj.items() if isinstance(obj, dict) else obj
+    n = 0
+    # Account for the enclosing brackets.
+    length = 2
+    for item in items:
+        # Every item after the first is preceded by ", ".
+        length += len(repr(item)) + (2 if n else 0)
+        if n and length > max_len:
+            break
+        n += 1
+    return n
+
+
+def _array_head_str(array: Any, max_len: int) -> str:
+    """Format the first few values of a multidimensional array-like, nested to
+    match its number of dimensions, e.g. '[[0.0, 0.0, ...], ...]'. We can't
+    just slice off some rows like we do for 1D data since a single row can be
+    far longer than max_len.
+    """
+    row = array[(0,) * (array.ndim - 1)]
+    values = row[:max_len].tolist()
+    n = _n_items_that_fit(values, max_len)
+    res = repr(values[:n])
+    if n < len(row):
+        res = res[:-1] + ', ...]'
+    # Only claim there are more rows/slices where a dimension actually has
+    # more than the one entry we showed.
+    for size in reversed(array.shape[:-1]):
+        res = f'[{res}, ...]' if size > 1 else f'[{res}]'
+    return res
+
+
 @fallback(default_func=qualname)
 def truncated_repr(obj: Any, max_len: int = 400) -> str:
     """Return an object's repr, truncated to ensure that it doesn't take up
@@ -268,37 +402,60 @@ def truncated_repr(obj: Any, max_len: int = 400) -> str:
         deal, at least at the moment. I can always revisit that later if
         necessary.
     """
-    repr_ = repr(obj)
-    if len(repr_) < max_len:
-        return repr_
+    # Every item in a builtin container (or character in a str/bytes) adds at
+    # least one character to its repr, so one with more than max_len items
+    # can't possibly fit. Skip building a potentially enormous repr of the
+    # whole thing (e.g. list(range(1_000_000))) just to find that out.
+    is_builtin_container = isinstance(obj, (list, tuple, set, dict))
+    is_text = isinstance(obj, (str, bytes, bytearray))
+    too_long = (is_builtin_container or is_text) and len(obj) > max_len
+    sample = obj
+    if not too_long:
+        repr_ = repr(obj)
+        if len(repr_) < max_len:
+            return repr_
+    elif is_text:
+        # Only the start of the text can end up in the output.
+        sample = obj[:max_len]
+        repr_ = repr(sample)
 
     if isinstance(obj, str):
         return repr_[:max_len - 16] + "...' (truncated)"
 
     if isinstance(obj, Iterable):
-        # A bit risky but sort of elegant. Just recursively take smaller
-        # slices until we get an acceptable length. We may end up going
-        # slightly over the max length after adding our ellipses but it's
-        # not that big a deal, this isn't meant to be super precise. We
-        # can also end up with fewer items than we could have fit - if we
-        # exhaustively check every possible length one by one until we
-        # find the max length that fits, we can get a very slow function
-        # when inputs are long.
-        # Can't easily pass smaller max_len value into recursive call
-        # because we always want to compare to the user-specified value.
-        # n is the approximate number of items we expect to be able to fit in
-        # a truncated repr of length <= max_len, though this is of course not
-        # bulletproof (usually only a problem for nested or multidimensional
-        # data structures).
-        n = max(1, int(max_len / len(repr_) * len(obj)))  # type: ignore
-
-        # Need to slice set while keeping the original dtype.
-        if isinstance(obj, set):
-            slice_ = set(list(obj)[:n])
-        elif isinstance(obj, dict):
-            slice_ = list(obj.items())[:n]
+        array_like = is_array_like(obj)
+        if array_like and obj.ndim > 1:
+            return format_listlike_with_metadata(
+                obj,
+                truncated_data=_array_head_str(obj, max_len)
+            )
+
+        # n is the number of items we expect to be able to fit in a
+        # truncated repr of length <= max_len. We may end up going slightly
+        # over the max length after adding our ellipses but it's not that big
+        # a deal, this isn't meant to be super precise.
+        if is_builtin_container:
+            # Leave room for the type name and length that
+            # format_listlike_with_metadata wraps around the items, e.g.
+            # '<list>' and ', len=1000>'.
+            overhead = (len(qualname(obj))
+                        + len(f', len={len(obj)}>'))  # type: ignore
+            n = _n_items_that_fit(obj, max_len - overhead)  # type: ignore
+        elif array_like:
+            # Array reprs are already summarized (numpy only shows the first
+            # and last few values of a large array), so the ratio estimate
+            # below would ask for far more items than fit. Measure the
+            # leading values instead.
+            n = _n_items_that_fit(obj[:max_len].tolist(),  # type: ignore
+                                  max_len)
         else:
-            slice_ = obj[:n]  # type: ignore
+            # Other iterables (e.g. pandas objects) don't necessarily iterate
+            # over the same things they slice by, so estimate n from the
+            # ratio of max_len to the full repr's length instead. This is of
+            # course not bulletproof (usually only a problem for nested or
+            # multidimensional data structures).
+            n = max(1, int(max_len / len(repr_) * len(sample)))  # type: ignore
+        slice_ = _head(obj, n)
 
         if n == len(obj):
             # Slicing didn't help in this case so do some manual surgery.
@@ -346,10 +503,21 @@ def load_yaml(path: Union[str, Path], section: Optional[str] = None) -> Dict:
     Returns
     -------
     dict
+
+    Parsed files are cached and only re-read when their mtime or size
+    changes. Each call returns a fresh deep copy so callers can mutate the
+    result freely.
     """
-    with open(path, 'r') as f:
-        data = yaml.load(f, Loader=yaml.FullLoader) or {}
-    return data.get(section, data)
+    key = os.path.abspath(os.path.expanduser(os.fspath(path)))
+    stat = os.stat(key)
+    cached = _yaml_cache.get(key)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        data = cached[2]
+    else:
+        with open(key, 'r') as f:
+            data = yaml.load(f, Loader=_YamlLoader) or {}
+        _yaml_cache[key] = (stat.st_mtime_ns, stat.st_size, data)
+    return deepcopy(data.get(section, data))
 
 
 def update_yaml(path: Union[str, Path], delete_if_none: bool = True,
@@ -379,8 +547,26 @@ def update_yaml(path: Union[str, Path], delete_if_none: bool = True,
             data.pop(k, None)
         else:
             data[k] = v
-    with open(path, 'w') as f:
-        yaml.dump(data, f)
+    # Evict explicitly: a same-size write can land within the filesystem's
+    # mtime resolution and look unchanged to load_yaml.
+    _yaml_cache.pop(os.path.abspath(path), None)
+    # Write to a temp file and swap it in so a concurrent reader (or a crash
+    # mid-write) never sees a partially written file. Resolve symlinks first
+    # so we replace the file they point to rather than the link itself.
+    target = path.resolve()
+    tmp_path = target.with_name(f'.{target.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp_path, 'w') as f:
+            yaml.dump(data, f, Dumper=_YamlDumper, default_flow_style=False)
+        # Keep the original permissions, e.g. a 0600 config holding an api
+        # key shouldn't become world readable.
+        if target.exists():
+            shutil.copymode(target, tmp_path)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
 
 
 def extract_code(
@@ -438,16 +624,59 @@ def extract_code(
     '''
     ```
     """
-    chunks = re.findall("(?s)```(?:python)?\n(.*?)\n```", text)
+    chunks = _find_code_blocks(text)
     if not join_multi:
         return chunks
-    if len(chunks) > 1:
-        chunks = [multi_prefix_template.format(i=i) + chunk
-                  for i, chunk in enumerate(chunks, 1)]
-        chunks[0] = chunks[0].lstrip()
+    # Most completions contain 0 or 1 code blocks, which need no prefixes.
+    if len(chunks) < 2:
+        return chunks[0] if chunks else ''
+    chunks = [multi_prefix_template.format(i=i) + chunk
+              for i, chunk in enumerate(chunks, 1)]
+    chunks[0] = chunks[0].lstrip()
     return ''.join(chunks)
 
 
+def _find_code_blocks(text: str) -> List[str]:
+    r"""Find the contents of all fenced code blocks in a string, i.e. the
+    equivalent of re.findall('(?s)```(?:python)?\n(.*?)\n```', text),
+    using str.find rather than the regex engine.
+
+    A block opens with ``` or ```python immediately followed by a newline and
+    closes at the next newline immediately followed by ```, so indented
+    fences inside the code (e.g. in a docstring) don't end the block.
+
+    Parameters
+    ----------
+    text : str
+
+    Returns
+    -------
+    list[str]
+    """
+    chunks = []
+    pos = 0
+    while True:
+        open_idx = text.find('```', pos)
+        if open_idx == -1:
+            return chunks
+        start = open_idx + 3
+        if text.startswith('python\n', start):
+            start += 7
+        elif text.startswith('\n', start):
+            start += 1
+        else:
+            # Not an opening fence, but a later backtick might start one.
+            pos = open_idx + 1
+            continue
+        close_idx = text.find('\n```', start)
+        # Any later opening fence would start after this one, so if this
+        # block never closes, neither will any of them.
+        if close_idx == -1:
+            return chunks
+        chunks.append(text[start:close_idx])
+        pos = close_idx + 4
+
+
 def parse_completion(text: str) -> Dict:
     """This function is called on the gpt completion text in
     roboduck.debug.DuckDB.ask_language_model (i.e. when the user asks a
@@ -479,8 +708,20 @@ def parse_completion(text: str) -> Dict:
     # code only, maybe that's okay. Extract_code could get weird if gpt
     # uses triple backticks in a function docstring but that should be very
     # rare, and the instructions sort of discourage it.
-    explanation = text.partition('\n```')[0]
-    code = extract_code(text)
+    idx = text.find('\n```')
+    if idx == -1:
+        explanation = text
+        code = extract_code(text)
+    else:
+        explanation = text[:idx]
+        # Usually the first fence comes right after the explanation, so there
+        # is no need to rescan the explanation for code blocks. If a fence
+        # does appear in it (e.g. at the very start of the completion), fall
+        # back to scanning everything so that block isn't lost.
+        if '```' in explanation:
+            code = extract_code(text)
+        else:
+            code = extract_code(text[idx:])
     return {'explanation': explanation,
             'code': code}
 
@@ -497,10 +738,22 @@ def available_models() -> Dict:
         roboduck class named like ChatOpenai (i.e. Chat{provider.title()}).
         Eventually would like to support other providers like anthropic but
         never got off API waitlist.
+
+    Results are cached for an hour (per api key) since the list rarely
+    changes and fetching it is a network round trip. Call
+    `available_models.cache_clear()` to force a fresh request.
     """
     # Weirdly, env var is set and available but openai can't seem to find it
     # unless we explicitly set it here.
-    openai.api_key = os.environ.get('OPENAI_API_KEY')
+    api_key = os.environ.get('OPENAI_API_KEY')
+    cached = _available_models_cache.get(api_key)
+    if cached and time.monotonic() - cached[0] < AVAILABLE_MODELS_TTL:
+        return {k: list(v) for k, v in cached[1].items()}
+
+    # Imported here rather than at module level because openai is slow to
+    # import and this is the only function in the module that needs it.
+    import openai
+    openai.api_key = api_key
     res = {}
 
     # This logic may not always hold but as of April 2023, this returns
@@ -508,7 +761,11 @@ def available_models() -> Dict:
     openai_res = openai.Model.list()
     res['openai'] = [row['id'] for row in openai_res['data']
                      if row['id'].startswith('gpt')]
-    return res
+    _available_models_cache[api_key] = (time.monotonic(), res)
+    return {k: list(v) for k, v in res.items()}
+
+
+available_models.cache_clear = _available_models_cache.clear
 
 
 def make_import_statement(cls_name: str) -> str:
@@ -528,9 +785,7 @@ def make_import_statement(cls_name: str) -> str:
     str
         E.g. "from roboduck import DuckDB"
     """
-    parts = cls_name.split('.')
-    if len(parts) == 1:
-        return f'import {parts[0]}'
-    else:
-        lib = '.'.join(parts[:-1])
-        return f'from {lib} import {parts[-1]}'
+    lib, sep, name = cls_name.rpartition('.')
+    if not sep:
+        return f'import {name}'
+    return f'from {lib} import {name}'
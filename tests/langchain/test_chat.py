@@ -1,7 +1,13 @@
+import asyncio
 import inspect
-from langchain.schema import AIMessage, SystemMessage, HumanMessage
+from langchain.callbacks import StdOutCallbackHandler
+from langchain.schema import AIMessage, ChatGeneration, HumanMessage, \
+    LLMResult, SystemMessage
 import pytest
+from unittest.mock import patch
+import warnings
 
+from roboduck.config import DEFAULTS_APPLIED_KEY
 from roboduck.langchain.chat import Chat, DummyChatModel
 
 
@@ -38,6 +44,22 @@ def test_chat_extra_kwargs():
     assert chat.kwargs['max_tokens'] == max_tokens
 
 
+@pytest.mark.parametrize('key', ['contextful', 'contextless'])
+def test_user_message_matches_langchain_format(key):
+    chat = Chat.from_template('debug', chat_class=DummyChatModel)
+    kwargs = {name: f'<{name} {{not a field}}>'
+              for name in chat.input_variables(key)}
+    msg = chat.user_message(key_=key, **kwargs)
+    assert isinstance(msg, HumanMessage)
+    assert msg == chat.user_templates[key].format(**kwargs)
+
+    with pytest.raises(KeyError):
+        chat.user_message(key_=key, **kwargs, not_a_field='x')
+    kwargs.popitem()
+    with pytest.raises(KeyError):
+        chat.user_message(key_=key, **kwargs)
+
+
 def test_truncate_history():
     chat = Chat.from_template('debug', chat_class=DummyChatModel,
                               streaming=False)
@@ -56,3 +78,111 @@ def test_truncate_history():
         else:
             assert new_n_words == n_words
             assert new_n_turns == n_turns
+
+
+class SplitCountingStr(str):
+    """Lets tests check whether _truncate_history counted a message's words."""
+
+    n_splits = 0
+
+    def split(self, *args, **kwargs):
+        type(self).n_splits += 1
+        return super().split(*args, **kwargs)
+
+
+def test_truncate_history_indented_code():
+    # Indentation is mostly spaces, which shouldn't count as words.
+    chat = Chat.from_template('debug', chat_class=DummyChatModel,
+                              streaming=False, model_name='gpt-4')
+    code = 'def foo(x):\n' + '        y = bar(x, z)\n' * 1_000
+    assert len(code.split()) < chat.prompt_words_hard_limit \
+        < code.count(' ')
+    chat._history.append(HumanMessage(content=code))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        chat._truncate_history()
+    assert len(chat._history) == 2
+
+
+def test_truncate_history_skips_counting_short_history(monkeypatch):
+    chat = Chat.from_template('debug', chat_class=DummyChatModel,
+                              streaming=False)
+    base = sum(len(row.content) + 2 for row in chat._history)
+    chat.prompt_words_soft_limit = base + 100
+    monkeypatch.setattr(SplitCountingStr, 'n_splits', 0)
+    content = SplitCountingStr('a ' * 49)
+    chat._history.append(HumanMessage(content=content))
+    history = list(chat._history)
+
+    chat._truncate_history()
+    assert chat._history == history
+    assert SplitCountingStr.n_splits == 0
+
+
+def test_truncate_history_counts_history_just_over_bound(monkeypatch):
+    chat = Chat.from_template('debug', chat_class=DummyChatModel,
+                              streaming=False)
+    base = sum(len(row.content) + 2 for row in chat._history)
+    system_words = len(chat._history[0].content.split()) + 1
+    # Upper bound is base + 104, just over the soft limit. Real word count
+    # only allows the system prompt plus one 25 word turn.
+    chat.prompt_words_soft_limit = base + 100
+    chat.prompt_words_hard_limit = system_words + 26
+    monkeypatch.setattr(SplitCountingStr, 'n_splits', 0)
+    user = HumanMessage(content=SplitCountingStr('a ' * 25))
+    ai = AIMessage(content=SplitCountingStr('b ' * 25))
+    chat._history.extend([user, ai])
+
+    chat._truncate_history()
+    assert SplitCountingStr.n_splits > 0
+    assert chat._history[1:] == [ai]
+
+
+def test_streaming_chats_get_separate_callback_managers():
+    chats = [Chat.from_template('debug', chat_class=DummyChatModel,
+                                streaming=True) for _ in range(2)]
+    managers = [chat.chat.callback_manager for chat in chats]
+    assert managers[0] is not managers[1]
+
+    managers[0].add_handler(StdOutCallbackHandler())
+    assert len(managers[0].handlers) == 2
+    assert len(managers[1].handlers) == 1
+
+
+def test_from_template_does_not_leak_config_marker():
+    chat = Chat.from_template('debug', chat_class=DummyChatModel)
+    assert DEFAULTS_APPLIED_KEY not in chat.kwargs
+    assert not hasattr(chat.chat, DEFAULTS_APPLIED_KEY)
+
+
+def test_reply_tracks_cached_tokens():
+    chat = Chat.from_template('debug', chat_class=DummyChatModel,
+                              streaming=False)
+    chat.contextless(question='What is going on?')
+    assert chat.last_usage == {}
+    assert chat.cached_tokens_total == 0
+
+    usage = {'prompt_tokens': 1200, 'completion_tokens': 30,
+             'prompt_tokens_details': {'cached_tokens': 1024}}
+    result = LLMResult(
+        generations=[[ChatGeneration(message=AIMessage(content='Answer.'))]],
+        llm_output={'token_usage': usage}
+    )
+    with patch.object(chat.chat, 'generate', return_value=result):
+        chat.contextless(question='What about now?')
+        chat.contextless(question='And now?')
+    assert chat.last_usage == usage
+    assert chat.cached_tokens_total == 2048
+    assert chat._history[-1].content == 'Answer.'
+
+
+def test_dummy_chat_model_agenerate_warns_once():
+    model = DummyChatModel(streaming=False)
+    messages = [HumanMessage(content='hi')]
+    with pytest.warns(UserWarning, match='_agenerate'):
+        res = asyncio.run(model._agenerate(messages))
+    assert res.generations[0].message.content == 'HI'
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        asyncio.run(model._agenerate(messages))
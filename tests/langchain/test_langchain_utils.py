@@ -0,0 +1,34 @@
+"""File name must differ from tests/test_utils.py to avoid pytest error.
+"""
+import pytest
+
+from roboduck.langchain.utils import model_context_window, \
+    DEFAULT_CONTEXT_WINDOW, MODEL_CONTEXT_WINDOWS
+
+
+@pytest.mark.parametrize(
+    'model_name,expected',
+    [
+        ('gpt-4', 8_192),
+        ('gpt-4-0613', 8_192),
+        ('gpt-4-32k-0613', 32_768),
+        ('gpt-4o', 128_000),
+        ('gpt-4o-2024-05-13', 128_000),
+        ('gpt-4o-mini-2024-07-18', 128_000),
+        ('gpt-3.5-turbo-16k', 16_385),
+        ('gpt-40', DEFAULT_CONTEXT_WINDOW),
+        ('claude', DEFAULT_CONTEXT_WINDOW),
+        (None, DEFAULT_CONTEXT_WINDOW),
+    ]
+)
+def test_model_context_window(model_name, expected):
+    assert model_context_window(model_name) == expected
+
+
+def test_model_context_window_custom_default():
+    assert model_context_window('not-a-model', default=-1) == -1
+
+
+def test_model_context_windows_is_read_only():
+    with pytest.raises(TypeError):
+        MODEL_CONTEXT_WINDOWS['gpt-4'] = 1
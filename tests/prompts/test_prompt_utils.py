@@ -1,5 +1,6 @@
 """File name must differ from tests/test_utils.py to avoid pytest error.
 """
+import os
 from pathlib import Path
 import pytest
 
@@ -14,6 +15,18 @@ def test_available_templates():
     chat_templates = utils.available_templates('chat')
     assert chat_templates == all_templates['chat']
 
+    # Results are cached, so make sure callers get their own copy.
+    chat_templates.add('not_a_real_prompt')
+    assert 'not_a_real_prompt' not in utils.available_templates('chat')
+    utils.available_templates.cache_clear()
+    assert utils.available_templates('chat') == all_templates['chat']
+
+
+def test_valid_modes():
+    assert utils.VALID_MODES == {'chat', 'completion'}
+    with pytest.raises(ValueError):
+        utils.available_templates('not_a_mode')
+
 
 def test_load_template():
     template = utils.load_template('debug')
@@ -26,4 +39,31 @@ def test_load_template():
     template_2 = utils.load_template(
         repo_root/'lib/roboduck/prompts/chat/debug.yaml'
     )
-    assert template_2 == template
\ No newline at end of file
+    assert template_2 == template
+
+
+def test_load_template_returns_independent_copies():
+    template = utils.load_template('debug')
+    template['kwargs']['model_name'] = 'mutated'
+    template['user'].clear()
+
+    fresh = utils.load_template('debug')
+    assert fresh['kwargs']['model_name'] != 'mutated'
+    assert fresh['user']
+
+
+def test_load_template_reloads_edited_file(tmp_path):
+    path = tmp_path/'custom.yaml'
+    path.write_text('system: old\n')
+    assert utils.load_template(path)['system'] == 'old'
+
+    path.write_text('system: new\n')
+    # Force a distinct mtime in case both writes land in the same tick.
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert utils.load_template(path)['system'] == 'new'
+
+
+def test_load_template_invalid_name():
+    with pytest.raises(ValueError):
+        utils.load_template('not_a_real_prompt')
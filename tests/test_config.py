@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 import pytest
+import warnings
 
 from roboduck import config
 
@@ -18,6 +19,11 @@ def test_get_config_path():
     os.environ[config.CONFIG_PATH_ENV_VAR] = custom_path
     config_path = config.get_config_path()
     assert config_path == Path(custom_path)
+
+    # User paths should be expanded like our default path.
+    os.environ[config.CONFIG_PATH_ENV_VAR] = '~/custom/config.yaml'
+    config_path = config.get_config_path()
+    assert config_path == Path('~/custom/config.yaml').expanduser()
     os.environ[config.CONFIG_PATH_ENV_VAR] = old_path
 
 
@@ -38,6 +44,18 @@ def test_set_default_model_name():
     assert 'openai_api_key' in cfg
 
 
+def test_load_config_uses_cache_until_file_changes():
+    config.update_config(model_name='gpt-4')
+    cfg = config.load_config()
+    cfg['model_name'] = 'mutated'
+    assert config.load_config()['model_name'] == 'gpt-4'
+
+    # Same-size rewrite so only update_config's eviction can catch it.
+    config.update_config(model_name='gpt-5')
+    assert config.load_config()['model_name'] == 'gpt-5'
+    config.update_config(model_name=None)
+
+
 def test_apply_config_defaults():
     model_name = 'gpt-4'
     config.update_config(model_name=model_name)
@@ -50,3 +68,29 @@ def test_apply_config_defaults():
     config.apply_config_defaults(kwargs, template_only=False)
     assert kwargs['model_name'] == old_model_name
 
+
+def test_apply_config_defaults_skips_second_call():
+    config.update_config(model_name='gpt-4')
+    kwargs = {'model_name': 'gpt-3.5-turbo'}
+    config.apply_config_defaults(kwargs, template_only=True)
+    assert kwargs[config.DEFAULTS_APPLIED_KEY]
+
+    # Simulate user overriding the template after defaults were applied. The
+    # second call should respect that and remove the marker.
+    kwargs['model_name'] = 'gpt-4o'
+    config.apply_config_defaults(kwargs, template_only=False)
+    assert kwargs == {'model_name': 'gpt-4o'}
+    config.update_config(model_name=None)
+
+
+def test_set_openai_api_key_skips_repeat_calls():
+    # Unusual key warns the first time it's set...
+    os.environ['OPENAI_API_KEY'] = 'abc'
+    with pytest.warns(UserWarning, match='looks unusual'):
+        config.set_openai_api_key()
+
+    # ...but not on repeated calls with the same key.
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        config.set_openai_api_key()
+    config.set_openai_api_key('xyz')
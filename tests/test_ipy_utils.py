@@ -0,0 +1,20 @@
+import pytest
+
+from roboduck.ipy_utils import is_ipy_name
+
+
+@pytest.mark.parametrize(
+    'name',
+    ['_', '__', '___', '_i3', '__i3', '_i', '_4', '_9913', '__7', '__23874',
+     'In', 'Out', '_ii', '_iii', '_oh']
+)
+def test_is_ipy_name_true(name):
+    assert is_ipy_name(name)
+
+
+@pytest.mark.parametrize(
+    'name',
+    ['_a', 'i22', '__0i', '_03z', '__99t', '___5', '_ii3', 'df', '_private']
+)
+def test_is_ipy_name_false(name):
+    assert not is_ipy_name(name)
@@ -20,6 +20,14 @@ def test_exception_logging(capfd):
     assert error_message in out
 
 
+def test_unraised_exception_logged_without_explanation(capfd):
+    logger = logging.getLogger('test', chat_class=DummyChatModel)
+    logger.error(ValueError('never raised'))
+    out, _ = capfd.readouterr()
+    assert 'never raised' in out
+    assert 'NATURAL LANGUAGE ANSWER' not in out
+
+
 def test_stdout_logging(capfd):
     logger = logging.DuckLogger('test', chat_class=DummyChatModel)
     logger.warning('this is a warning')
@@ -59,3 +67,12 @@ def test_file_logging(tmp_path, capfd):
 def test_logger_requires_at_least_one_handler():
     with pytest.raises(RuntimeError):
         logger = logging.getLogger('test', stdout=False, path='')
+
+
+def test_logger_warns_once_for_overridden_kwargs():
+    with pytest.warns(UserWarning) as record:
+        logging.getLogger('test', chat_class=DummyChatModel, auto=False,
+                          interactive=True)
+    assert len(record) == 1
+    msg = str(record[0].message)
+    assert 'auto=False' in msg and 'interactive=True' in msg
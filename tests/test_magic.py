@@ -0,0 +1,21 @@
+from IPython.core.error import UsageError
+import pytest
+import sys
+
+import roboduck
+from roboduck.magic import DebugMagic
+
+
+def test_duck_bad_args_leave_excepthook_unchanged(monkeypatch):
+    # Force a fresh import of roboduck.errors so that %duck would trigger its
+    # import-time enable() if it got that far.
+    monkeypatch.delitem(sys.modules, 'roboduck.errors', raising=False)
+    monkeypatch.delattr(roboduck, 'errors', raising=False)
+    old_hook = sys.excepthook
+
+    with pytest.raises(UsageError):
+        DebugMagic(shell=None).duck('--bogus')
+    hook = sys.excepthook
+    # Restore before asserting so a failure doesn't leave roboduck's hook on.
+    sys.excepthook = old_hook
+    assert hook is old_hook
@@ -1,3 +1,6 @@
+import inspect
+import os
+import stat
 import numpy as np
 import pandas as pd
 import pytest
@@ -53,9 +56,14 @@ def test_truncated_repr_uses_fallback_when_getitem_raises_error(obj, expected):
 @pytest.mark.parametrize(
     'obj, n, expected',
     [
+        # Builtin containers keep as many leading items as fit in max_len
+        # alongside the type name and length.
         (list(range(1000)),
          50,
          "<list, truncated_data=[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, ...], len=1000>"),
+        (set(range(1000)),
+         50,
+         "<set, truncated_data={0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, ...}, len=1000>"),
         (pd.DataFrame(np.arange(390).reshape(30, 13),
                       columns=list('abcdefghijklm')),
          79,
@@ -63,7 +71,21 @@ def test_truncated_repr_uses_fallback_when_getitem_raises_error(obj, expected):
         ("abcdefghijklmnopqrstuvwxyz", 21, "'abcd...' (truncated)"),
         (dict(enumerate('abcdefghijklmnop')),
          50,
-         "<dict, truncated_data=[(0, 'a'), (1, 'b'), (2, 'c'), (3, 'd'), (4, 'e'), ...], len=16>"),
+         "<dict, truncated_data=[(0, 'a'), (1, 'b'), (2, 'c'), ...], len=16>"),
+        # Arrays are sized from their values, not numpy's summarized repr.
+        (np.arange(100),
+         50,
+         "<numpy.ndarray, truncated_data=[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, ...], shape=(100,), dtype=int64>"),
+        (np.zeros((50, 50)),
+         50,
+         "<numpy.ndarray, truncated_data=[[0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, ...], ...], shape=(50, 50), dtype=float64>"),
+        # Dimensions with a single entry don't get a row ellipsis.
+        (np.zeros((1, 500)),
+         50,
+         "<numpy.ndarray, truncated_data=[[0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, ...]], shape=(1, 500), dtype=float64>"),
+        (np.zeros((2, 1, 500)),
+         50,
+         "<numpy.ndarray, truncated_data=[[[0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, ...]], ...], shape=(2, 1, 500), dtype=float64>"),
     ]
 )
 def test_truncated_repr_long_inputs(obj, n, expected):
@@ -81,7 +103,7 @@ def test_truncated_repr_long_inputs(obj, n, expected):
         (
             [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10, 11, 12]],
             40,
-            "<list, truncated_data=[[1, 2, 3], [4, 5, 6], [7, 8, 9], ...], len=4>"
+            "<list, truncated_data=[[1, 2, 3], [4, 5, 6], ...], len=4>"
         ),
         (
             [{'a': 1, 'b': 2}, {'c': 3, 'd': 4}, {'e': 5, 'f': 6}],
@@ -104,6 +126,48 @@ def test_truncated_repr_nested_inputs(obj, n, expected):
     assert utils.truncated_repr(obj, n) == expected
 
 
+def test_colordiff_new_str_identical_inputs():
+    code = 'def foo(x):\n    return x + 1\n'
+    assert utils.colordiff_new_str(code, code) == code
+
+
+@pytest.mark.parametrize('granularity', ['line', 'char'])
+def test_colordiff_new_str_empty_inputs(granularity):
+    code = 'x = 1\n'
+    assert utils.colordiff_new_str('', code, granularity=granularity) \
+        == utils.colored(code, 'green')
+    assert utils.colordiff_new_str(code, '', granularity=granularity) == ''
+
+
+def test_colordiff_new_str_colors_new_parts():
+    old = 'x = 1\n'
+    new = 'x = 1\ny = 2\n'
+    res = utils.colordiff_new_str(old, new)
+    assert res.startswith(old)
+    assert utils.colored('y = 2\n', 'green') in res
+
+
+def test_colordiff_new_str_granularity():
+    old = 'x = 1\n'
+    new = 'x = 2\n'
+    assert utils.colordiff_new_str(old, new, granularity='line') \
+        == utils.colored(new, 'green')
+    assert utils.colordiff_new_str(old, new, granularity='char') \
+        == 'x = ' + utils.colored('2', 'green') + '\n'
+    with pytest.raises(ValueError):
+        utils.colordiff_new_str(old, new, granularity='word')
+
+
+@pytest.mark.parametrize('granularity', ['line', 'char'])
+def test_colordiff_new_str_long_repetitive_input(granularity):
+    # Long enough that SequenceMatcher's autojunk heuristic would kick in and
+    # color everything after the first change.
+    old = 'x = 1\n' * 300
+    new = old.replace('x = 1', 'x = 2', 1)
+    res = utils.colordiff_new_str(old, new, granularity=granularity)
+    assert res.endswith(old[6:])
+
+
 @pytest.mark.parametrize(
     "d, func, expected",
     [
@@ -121,7 +185,11 @@ def test_type_annotated_dict_str(d, func, expected):
     ("No code snippet here.", True, ""),
     ("```python\nprint('Code only')\n```", True, "print('Code only')"),
     ("```\nprint('Multiple code snippets')\n```\n```python\nprint('another one')\n```", True, "# 1\nprint('Multiple code snippets')\n\n# 2\nprint('another one')"),
-    ("```python\nprint('Hello, World!')\n```\n```python\nprint('Goodbye, World!')\n```", False, ["print('Hello, World!')", "print('Goodbye, World!')"])
+    ("```python\nprint('Hello, World!')\n```\n```python\nprint('Goodbye, World!')\n```", False, ["print('Hello, World!')", "print('Goodbye, World!')"]),
+    ("```python\nprint('Unclosed')", False, []),
+    ("Use `x` or ``y``:\n```\nx = 1\n```", False, ["x = 1"]),
+    ("```py\nx = 1\n```", False, []),
+    ("```\n\n```", False, [""]),
 ])
 def test_extract_code(text, join_multi, expected_output):
     assert utils.extract_code(text, join_multi) == expected_output
@@ -161,6 +229,17 @@ def test_extract_code_with_backticks_in_code():
     assert utils.extract_code(completion) == expected
 
 
+@pytest.mark.parametrize("text, expected_output", [
+    ("No code here.", {'explanation': "No code here.", 'code': ""}),
+    ("Fix it.\n```python\nx = 1\n```",
+     {'explanation': "Fix it.", 'code': "x = 1"}),
+    ("```\nx = 1\n```\nThen:\n```\ny = 2\n```",
+     {'explanation': "```\nx = 1", 'code': "# 1\nx = 1\n\n# 2\ny = 2"}),
+])
+def test_parse_completion(text, expected_output):
+    assert utils.parse_completion(text) == expected_output
+
+
 def test_store_class_defaults():
     @roboduck.decorators.store_class_defaults(attr_filter=lambda x: x.startswith('last_'))
     class Foo:
@@ -181,6 +260,46 @@ def test_store_class_defaults():
     assert Foo.other is False
 
 
+def test_add_kwargs():
+    def func(a, key_='default', **kwargs):
+        return a, key_, kwargs
+
+    new_func = roboduck.decorators.add_kwargs(func, ['x', 'y'],
+                                              hide_fields=['key_'],
+                                              strict=True)
+    assert list(inspect.signature(new_func).parameters) == ['a', 'x', 'y']
+    assert new_func(1, x=2, y=3) == (1, 'default', {'x': 2, 'y': 3})
+    with pytest.raises(TypeError):
+        new_func(1, x=2)
+
+    with pytest.raises(TypeError):
+        roboduck.decorators.add_kwargs(lambda a: a, ['x'])
+    with pytest.raises(RuntimeError):
+        roboduck.decorators.add_kwargs(func, ['a'])
+    with pytest.raises(TypeError):
+        roboduck.decorators.add_kwargs(func, ['x'], hide_fields=['a'],
+                                       strict=True)
+
+
+@pytest.mark.parametrize('explicit', [True, False])
+def test_typecheck(explicit):
+    if explicit:
+        @roboduck.decorators.typecheck(x=int, y=(int, float))
+        def add(x, y=1.0, z=None):
+            return x + y
+    else:
+        @roboduck.decorators.typecheck
+        def add(x: int, y: (int, float) = 1.0, z=None):
+            return x + y
+
+    assert add(1) == 2.0
+    assert add(1, y=2, z='anything') == 3
+    with pytest.raises(TypeError, match='x must be'):
+        add(1.5)
+    with pytest.raises(TypeError, match='y must be'):
+        add(1, '2')
+
+
 @pytest.mark.parametrize(
     "obj,answer",
     (
@@ -217,7 +336,145 @@ def test_is_array_like(obj, answer):
         (np.array([]), True, "<numpy.ndarray>"),
         ([], True, "<list>"),
         ({}, True, "<dict>"),
+        (np.float64(1), True, "<numpy.float64>"),
     ]
 )
 def test_qualname(obj, with_brackets, expected):
     assert utils.qualname(obj, with_brackets=with_brackets) == expected
+
+
+def test_qualname_local_class():
+    class Local:
+        pass
+
+    assert utils.qualname(Local(), with_brackets=False) == \
+        f'{__name__}.test_qualname_local_class.<locals>.Local'
+
+
+def test_available_models_uses_cache(monkeypatch):
+    calls = []
+
+    def fake_list():
+        calls.append(1)
+        return {'data': [{'id': 'gpt-4'}, {'id': 'whisper-1'}]}
+
+    import openai
+    monkeypatch.setattr(openai.Model, 'list', fake_list)
+    utils.available_models.cache_clear()
+    res = utils.available_models()
+    assert res == {'openai': ['gpt-4']}
+    res['openai'].append('mutated')
+    assert utils.available_models() == {'openai': ['gpt-4']}
+    assert len(calls) == 1
+
+    utils.available_models.cache_clear()
+    utils.available_models()
+    assert len(calls) == 2
+
+    monkeypatch.setattr(utils, 'AVAILABLE_MODELS_TTL', 0)
+    utils.available_models()
+    assert len(calls) == 3
+    utils.available_models.cache_clear()
+
+
+def test_colored():
+    assert utils.colored('hi', 'green') == '\x1b[32mhi\x1b[0m'
+    assert utils.colored('hi', 'RED') == '\x1b[31mhi\x1b[0m'
+    assert utils.colored('hi', '') == 'hi'
+    with pytest.raises(ValueError):
+        utils.colored('hi', 'not_a_color')
+
+
+@pytest.mark.parametrize('default', [0, '', None, [], False])
+def test_fallback_allows_falsy_default(default):
+    @utils.fallback(default=default)
+    def fail():
+        raise ValueError
+
+    assert fail() is default
+
+
+def test_fallback_default_func():
+    @utils.fallback(default_func=lambda x: -x)
+    def invert(x):
+        return 1 / x
+
+    assert invert(4) == .25
+    assert invert(0) == 0
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'default': 0, 'default_func': abs}])
+def test_fallback_requires_exactly_one_arg(kwargs):
+    with pytest.raises(ValueError):
+        utils.fallback(**kwargs)
+
+
+def test_load_yaml_cache_returns_copies_and_sees_updates(tmp_path):
+    path = tmp_path/'data.yaml'
+    utils.update_yaml(path, a={'b': 1})
+    data = utils.load_yaml(path)
+    data['a']['b'] = 'mutated'
+    assert utils.load_yaml(path) == {'a': {'b': 1}}
+
+    # Same-size rewrite so only update_yaml's eviction can catch it.
+    utils.update_yaml(path, a={'b': 2})
+    assert utils.load_yaml(path) == {'a': {'b': 2}}
+    assert utils.load_yaml(path, section='a') == {'b': 2}
+
+
+@pytest.mark.parametrize('obj', ['ab' * 100_000, "it's" * 100_000])
+def test_truncated_repr_long_str_matches_full_repr_prefix(obj):
+    max_len = 79
+    assert utils.truncated_repr(obj, max_len) == \
+        repr(obj)[:max_len - 16] + "...' (truncated)"
+
+
+def test_truncated_repr_long_bytes():
+    res = utils.truncated_repr(b'abc' * 100_000, 79)
+    assert res.startswith("<bytes, truncated_data=b'abcabc")
+    assert res.endswith(', len=300000>')
+
+
+def test_update_yaml_failed_write_keeps_original(tmp_path):
+    path = tmp_path/'subdir'/'data.yaml'
+    utils.update_yaml(path, a=1)
+    with pytest.raises(Exception):
+        # The safe dumper can't serialize arbitrary objects.
+        utils.update_yaml(path, b=object())
+    assert utils.load_yaml(path) == {'a': 1}
+    assert [p.name for p in path.parent.iterdir()] == ['data.yaml']
+
+
+@pytest.mark.parametrize(
+    'cls_name, expected',
+    [
+        ('roboduck', 'import roboduck'),
+        ('roboduck.DuckDB', 'from roboduck import DuckDB'),
+        ('roboduck.debug.DuckDB', 'from roboduck.debug import DuckDB'),
+    ]
+)
+def test_make_import_statement(cls_name, expected):
+    assert utils.make_import_statement(cls_name) == expected
+
+
+@pytest.mark.parametrize(
+    'obj',
+    [np.random.rand(1_000_000), np.random.rand(300, 300),
+     pd.Series(np.random.rand(100_000))]
+)
+def test_truncated_repr_large_arrays_stay_short(obj):
+    # Metadata like shape and dtype can push us past max_len, but not by much.
+    assert len(utils.truncated_repr(obj, 79)) < 200
+
+
+def test_update_yaml_keeps_mode_and_symlink(tmp_path):
+    target = tmp_path/'real'/'config.yaml'
+    utils.update_yaml(target, a=1)
+    os.chmod(target, 0o600)
+    link = tmp_path/'link.yaml'
+    link.symlink_to(target)
+
+    utils.update_yaml(link, b=2)
+    assert link.is_symlink()
+    assert utils.load_yaml(target) == {'a': 1, 'b': 2}
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o600